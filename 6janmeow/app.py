@@ -1,18 +1,31 @@
 # app.py
 import streamlit as st
 from pathlib import Path
-from file_manager import save_uploaded_file, group_outputs_by_table
+from file_manager import save_uploaded_file, group_files_by_table, scan_output_files
 from data_processor import (
     preview_file,
     preview_file_with_styles,
     build_combined_highlight_html,
 )
 from notebook_runner import run_notebook
-import mimetypes
 import streamlit.components.v1 as components
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
 import shutil
 import os
-import pandas as pd
+import re
+import queue
+import threading
+import time
+from datetime import date, datetime, time as dt_time
+from concurrent.futures import ThreadPoolExecutor
+from copy import copy
+from openpyxl import Workbook, load_workbook
+from openpyxl.cell import WriteOnlyCell
+
+try:
+    from python_calamine import CalamineWorkbook
+except ImportError:  # header reads fall back to openpyxl read_only mode
+    CalamineWorkbook = None
 
 
 # ---------------------
@@ -30,9 +43,65 @@ INPUT_DIR.mkdir(parents=True, exist_ok=True)
 OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
 EXPORT_DIR.mkdir(parents=True, exist_ok=True)
 
+# Compiled once: used per file / per cell in the export loop
+_HIGHLIGHTS_RE = re.compile(r'_Highlights\.xlsx$', re.IGNORECASE)
+_TITLE_RE = re.compile(r'(_Highlights|_highlighted|_Green_highlighted|_SigTestTable|_SigTestTable_Highlights).*$', re.IGNORECASE)
+_NUMERIC_STR_RE = re.compile(r"^-?\d+(\.\d+)?$")
+_UNNAMED = "unnamed"
+
+# The notebook only produces .xlsx and .csv, so no need for mimetypes.guess_type per file
+_MIME = {
+    ".xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    ".csv": "text/csv",
+}
+
+# How often the page re-polls a running notebook job
+NOTEBOOK_POLL_SECONDS = 1.0
+
+# ---------------------
+# Helper: run the notebook off the script thread
+# ---------------------
+def _start_notebook_job(nb_path: Path, input_file: Path, output_dir: Path):
+    """
+    Run run_notebook() in a daemon thread and return the job dict the UI polls:
+      queue    -> (fraction, message) progress updates from the worker
+      progress -> last drained (fraction, message)
+      result   -> None while running, then (success, message)
+    The worker never touches Streamlit; only the script thread renders.
+    """
+    job = {"queue": queue.Queue(), "progress": (0.0, "Starting notebook…"), "result": None}
+
+    def on_progress(frac, msg):
+        try:
+            frac = float(frac)
+        except Exception:
+            frac = 0.0
+        job["queue"].put((max(0.0, min(1.0, frac)), msg))
+
+    def _run():
+        try:
+            job["result"] = run_notebook(nb_path, input_file, output_dir, on_progress=on_progress)
+        except Exception as ex:
+            # run_notebook already reports its own failures; never leave the job hanging
+            job["result"] = (False, f"Unexpected error: {ex}")
+
+    threading.Thread(target=_run, name="notebook-runner", daemon=True).start()
+    return job
+
 # ---------------------
 # Helper: wipe outputs folder (safe)
 # ---------------------
+def _remove_entry(entry: os.DirEntry):
+    """Delete one directory entry; returns None on success or the exception raised."""
+    try:
+        if entry.is_dir(follow_symlinks=False):
+            shutil.rmtree(entry.path)
+        else:
+            os.unlink(entry.path)
+        return None
+    except Exception as e:
+        return e
+
 def wipe_output_dir(output_dir: Path):
     """
     Remove all files and subdirectories inside output_dir but keep the folder itself.
@@ -42,41 +111,221 @@ def wipe_output_dir(output_dir: Path):
     if not output_dir.exists():
         output_dir.mkdir(parents=True, exist_ok=True)
         return 0
-    removed = 0
-    for child in list(output_dir.iterdir()):
+    with os.scandir(output_dir) as it:
+        entries = list(it)
+    if not entries:
+        return 0
+    # unlink/rmtree are syscall-bound and release the GIL, so remove entries in parallel
+    with ThreadPoolExecutor(max_workers=min(8, len(entries))) as pool:
+        errors = list(pool.map(_remove_entry, entries))
+    failed = [(entry, err) for entry, err in zip(entries, errors) if err is not None]
+    if failed:
+        # log to Streamlit so user sees issues (from the script thread, not the workers)
+        st.warning(
+            "Could not remove:\n" + "\n".join(f"- {entry.path}: {err}" for entry, err in failed)
+        )
+    return len(entries) - len(failed)
+
+def _is_unnamed(name: str) -> bool:
+    """True for pandas-style placeholder headers ("Unnamed: 3")."""
+    return len(name) >= len(_UNNAMED) and name[:len(_UNNAMED)].casefold() == _UNNAMED
+
+@st.cache_resource(max_entries=64, show_spinner=False)
+def _calamine_workbook(path_str: str, mtime_ns: int):
+    """
+    Open CalamineWorkbook kept across reruns/sessions (zip index + shared strings stay loaded).
+    mtime_ns is only part of the key: a rewritten file gets a fresh handle. The handles keep
+    their files open, so call _calamine_workbook.clear() before deleting outputs.
+    Returns (workbook, lock): a handle is shared by every session and the prefetch pool, and
+    calamine raises "Already borrowed" on concurrent use, so hold the lock while reading.
+    """
+    return CalamineWorkbook.from_path(path_str), threading.Lock()
+
+def _read_header_row_calamine(xlsx_path: Path):
+    """
+    Raw first-row values of the first sheet via python-calamine, converted to what
+    openpyxl returns for the same cells (the export matches headers by str(cell.value)).
+    """
+    wb, lock = _calamine_workbook(str(xlsx_path), Path(xlsx_path).stat().st_mtime_ns)
+    with lock:
+        rows = wb.get_sheet_by_index(0).to_python(skip_empty_area=False, nrows=1)
+    values = []
+    for c in rows[0] if rows else ():
+        if isinstance(c, float) and c.is_integer() and abs(c) < 1e15:
+            # whole numbers are stored without a decimal point -> openpyxl reads an int
+            c = int(c)
+        elif type(c) is date:
+            # openpyxl reads date-formatted cells as datetimes ("2024-01-01 00:00:00")
+            c = datetime.combine(c, dt_time())
+        values.append(c)
+    return values
+
+def _read_header_row_openpyxl(xlsx_path: Path):
+    """Raw first-row values of the active sheet via openpyxl read_only mode (only row 1's XML is parsed)."""
+    wb = load_workbook(filename=str(xlsx_path), read_only=True, data_only=True)
+    try:
+        return next(wb.active.iter_rows(values_only=True), ())
+    finally:
+        wb.close()
+
+def read_excel_header(xlsx_path: Path):
+    """
+    Return column names from the first row of the first sheet (ignores blank / Unnamed columns).
+    Only the header row is parsed (python-calamine, else openpyxl read_only), so this stays
+    cheap on large workbooks. Names match the export's str(cell.value).strip() for the same
+    cells. Raises if the file can't be read.
+    """
+    header = None
+    if CalamineWorkbook is not None:
         try:
-            if child.is_dir():
-                shutil.rmtree(child)
-            else:
-                child.unlink()
-            removed += 1
-        except Exception as e:
-            # log to Streamlit so user sees issues
-            st.warning(f"Could not remove {child}: {e}")
-    return removed
+            header = _read_header_row_calamine(xlsx_path)
+        except Exception:
+            header = None
+    if header is None:
+        header = _read_header_row_openpyxl(xlsx_path)
+
+    cols = []
+    for c in header:
+        name = "" if c is None else str(c).strip()
+        if name and not _is_unnamed(name):
+            cols.append(name)
+    return cols
+
+def _is_numeric_str(val) -> bool:
+    """True for strings like "12" / "-3.5" (cheaper than try: float(...) on non-numeric text)."""
+    return isinstance(val, str) and _NUMERIC_STR_RE.match(val.strip()) is not None
+
+def _is_highlights_name(name: str) -> bool:
+    """True for *_Highlights files, excluding the SigTestTable outputs."""
+    lname = name.lower()
+    return "_highlights" in lname and "sigtesttable" not in lname
+
+def _copy_cell_for_write(dst_ws, src_cell):
+    """Copy a read_only cell (value + number format / fill / font / border / alignment) into a WriteOnlyCell."""
+    cell = WriteOnlyCell(dst_ws, value=src_cell.value)
+    if getattr(src_cell, "has_style", False):
+        cell.font = copy(src_cell.font)
+        cell.fill = copy(src_cell.fill)
+        cell.border = copy(src_cell.border)
+        cell.alignment = copy(src_cell.alignment)
+        cell.number_format = src_cell.number_format
+    return cell
+
+def file_download_button(path: Path, label: str, key: str, deferred: bool = True):
+    """
+    st.download_button for a file on disk. Streamlit reads the whole file into its media
+    store every time a download_button is rendered (an open handle is read straight away
+    too), so with deferred=True only a small "Prepare" button is shown until the user asks
+    for this file; from then on the real button is rendered on every rerun of the session.
+    """
+    path = Path(path)
+    if deferred:
+        prepared = st.session_state.setdefault("prepared_downloads", set())
+        if key not in prepared:
+            if not st.button(f"Prepare: {label}", key=f"prep_{key}"):
+                return False
+            prepared.add(key)
+    mime = _MIME.get(path.suffix.lower(), "application/octet-stream")
+    with open(path, "rb") as fh:
+        return st.download_button(label=label, data=fh, file_name=path.name, mime=mime, key=key)
+
+# ---------------------
+# Cached reads (Streamlit re-runs the whole script on every widget interaction)
+# ---------------------
+@st.cache_data(max_entries=256, show_spinner=False)
+def _cached_excel_header(path_str: str, mtime_ns: int, size: int):
+    # mtime/size are only part of the cache key, so a rewritten file is re-read
+    return read_excel_header(Path(path_str))
+
+def _header_memo():
+    """Per-session {path: ((mtime_ns, size), columns)} of headers already read this session."""
+    return st.session_state.setdefault("header_memo", {})
+
+def _header_for(xlsx_path: Path):
+    """
+    Column names of xlsx_path, shared by every caller in this session (global filter, per-file
+    selectors): the session memo is checked first, then the cross-session st.cache_data layer.
+    A changed mtime/size invalidates both. Raises if the file can't be read.
+    """
+    path = Path(xlsx_path)
+    stat = path.stat()
+    key = (stat.st_mtime_ns, stat.st_size)
+    memo = _header_memo()
+    hit = memo.get(str(path))
+    if hit is not None and hit[0] == key:
+        return hit[1]
+    cols = _cached_excel_header(str(path), *key)
+    memo[str(path)] = (key, cols)
+    return cols
 
 def get_excel_columns(xlsx_path: Path):
     """Return a list of column names from the first sheet (ignores Unnamed columns)."""
     try:
-        df_head = pd.read_excel(xlsx_path, engine="openpyxl", nrows=0, header=0)
-        cols = [
-            str(c).strip()
-            for c in df_head.columns
-            if c is not None and not str(c).strip().lower().startswith("unnamed")
-        ]
-        return cols
+        return _header_for(xlsx_path)
     except Exception:
-        # fallback if file has weird header formatting
+        return []
+
+def prefetch_excel_headers(paths):
+    """
+    _header_for() for many files at once: session-memo hits are returned directly and the
+    misses are read on a thread pool (separate workbooks are independent, so unzip + XML
+    parse overlap). Returns {path: [column, ...]} with the raised Exception in place of
+    columns on failure.
+    """
+    memo = _header_memo()
+    headers = {}
+    missing = []
+    for path in dict.fromkeys(paths):
         try:
-            df_head = pd.read_excel(xlsx_path, engine="openpyxl", nrows=0, header=None)
-            cols = [
-                str(c).strip()
-                for c in df_head.columns
-                if c is not None and not str(c).strip().lower().startswith("unnamed")
-            ]
-            return cols
-        except Exception:
-            return []
+            stat = Path(path).stat()
+        except OSError as e:
+            headers[path] = e
+            continue
+        key = (stat.st_mtime_ns, stat.st_size)
+        hit = memo.get(str(path))
+        if hit is not None and hit[0] == key:
+            headers[path] = hit[1]
+        else:
+            missing.append((path, key))
+    if not missing:
+        return headers
+
+    # share this rerun's context with the workers so st.cache_data works there;
+    # session_state is only touched from the script thread
+    ctx = get_script_run_ctx()
+
+    def _one(item):
+        path, key = item
+        add_script_run_ctx(threading.current_thread(), ctx)
+        try:
+            return _cached_excel_header(str(path), *key)
+        except Exception as e:
+            return e
+
+    with ThreadPoolExecutor(max_workers=min(8, len(missing))) as pool:
+        for (path, key), cols in zip(missing, pool.map(_one, missing)):
+            headers[path] = cols
+            if not isinstance(cols, Exception):
+                memo[str(path)] = (key, cols)
+    return headers
+
+@st.cache_data(ttl=5, show_spinner=False)
+def _scan_outputs(output_dir_str: str):
+    """
+    One scan_output_files pass over the outputs folder: sorted (name, path, mtime_ns, size)
+    per file. Everything that lists outputs (table groups, CSV masks) is derived from this.
+    Call _scan_outputs.clear() after changing the folder to skip the ttl.
+    """
+    entries = []
+    for e in scan_output_files(output_dir_str):
+        stat = e.stat()
+        entries.append((e.name, e.path, stat.st_mtime_ns, stat.st_size))
+    return sorted(entries)
+
+@st.cache_data(max_entries=8, show_spinner=False)
+def _cached_groups(entries):
+    # mtime/size in entries are part of the key, so rewritten outputs regroup
+    return group_files_by_table([Path(path) for _, path, _, _ in entries])
 
 # ---------------------
 # Streamlit UI setup
@@ -98,11 +347,24 @@ st.markdown(
     "- **export_files/** → final filtered Excel files"
 )
 
+# A notebook run in progress (see _start_notebook_job) is writing into highlighted_outputs/
+# and reading input_data/uploaded_file.xlsx: wiping the one or replacing the other is refused.
+_running_job = st.session_state.get("nb_job")
+notebook_running = _running_job is not None and _running_job["result"] is None
+
 col1, col2 = st.columns(2)
 
 with col1:
-    if st.button("🟥 Clear highlighted outputs", key="btn_clear_highlighted"):
+    if st.button(
+        "🟥 Clear highlighted outputs",
+        key="btn_clear_highlighted",
+        disabled=notebook_running,
+        help="Unavailable while the notebook is running." if notebook_running else None,
+    ):
+        # drop cached workbook handles first so no output file is held open
+        _calamine_workbook.clear()
         n_removed = wipe_output_dir(OUTPUT_DIR)
+        _scan_outputs.clear()
         if n_removed == 0:
             st.info("Nothing to clear — `highlighted_outputs/` is already empty.")
         else:
@@ -122,16 +384,31 @@ st.markdown("---")
 # ---------------------
 # Upload area
 # ---------------------
-uploaded = st.file_uploader("Upload an Excel file (.xlsx or .xls)", type=["xlsx", "xls"])
+uploaded = st.file_uploader(
+    "Upload an Excel file (.xlsx or .xls)",
+    type=["xlsx", "xls"],
+    disabled=notebook_running,
+    help="Unavailable while the notebook is running." if notebook_running else None,
+)
 # We'll persist the saved path in session_state so reruns keep it
 if "uploaded_saved_path" not in st.session_state:
     st.session_state["uploaded_saved_path"] = None
 
 if uploaded is not None:
-    # Save upload (fixed filename so notebook can read the same path)
-    saved_path = save_uploaded_file(uploaded, INPUT_DIR, filename="uploaded_file.xlsx")
-    st.session_state["uploaded_saved_path"] = str(saved_path)
-    st.success(f"Saved uploaded file as `{saved_path.name}` in `{INPUT_DIR}`")
+    # Save upload (fixed filename so notebook can read the same path). Only a new upload is
+    # written: reruns (e.g. the progress polling below) must not rewrite the file the
+    # notebook may be reading.
+    upload_id = getattr(uploaded, "file_id", None) or (uploaded.name, uploaded.size)
+    is_new_upload = st.session_state.get("uploaded_file_id") != upload_id or not st.session_state["uploaded_saved_path"]
+    if is_new_upload and notebook_running:
+        st.warning("The notebook is running — the new upload was not saved. Upload it again once the run has finished.")
+    elif is_new_upload:
+        saved_path = save_uploaded_file(uploaded, INPUT_DIR, filename="uploaded_file.xlsx")
+        st.session_state["uploaded_saved_path"] = str(saved_path)
+        st.session_state["uploaded_file_id"] = upload_id
+    if st.session_state["uploaded_saved_path"]:
+        saved_path = Path(st.session_state["uploaded_saved_path"])
+        st.success(f"Saved uploaded file as `{saved_path.name}` in `{INPUT_DIR}`")
 
 # Local variable for convenience
 uploaded_saved_path = st.session_state.get("uploaded_saved_path")
@@ -145,52 +422,71 @@ st.info(
 # 👇 DEFINE THE BUTTON FIRST
 confirm_run = st.button("✅ Confirm & Run notebook", key="btn_run_notebook")
 
-if confirm_run:
-    # Guard: ensure the user uploaded a file (saved to input_data/uploaded_file.xlsx)
-    if not uploaded_saved_path:
-        st.error("No uploaded file found. Please upload a file first (use the uploader above).")
-        st.stop()
+# The notebook runs in a background thread (see _start_notebook_job); the job dict lives in
+# session_state so every rerun can poll it (clearing outputs / uploading is disabled meanwhile).
+nb_job = st.session_state.get("nb_job")
 
-    # show quick debug info so user can see the path used
-    st.info(f"Using uploaded file: `{uploaded_saved_path}`")
-    try:
-        # list contents (helpful for remote debugging)
-        st.write("Contents of input_data:", [p.name for p in INPUT_DIR.iterdir()])
-    except Exception:
-        pass
-
-    progress = st.progress(0.0)
-    progress_msg = st.empty()
+if confirm_run:
+    if nb_job is not None and nb_job["result"] is None:
+        st.warning("The notebook is already running — wait for it to finish before starting another run.")
+    else:
+        # Guard: ensure the user uploaded a file (saved to input_data/uploaded_file.xlsx)
+        if not uploaded_saved_path:
+            st.error("No uploaded file found. Please upload a file first (use the uploader above).")
+            st.stop()
 
-    def on_progress(frac, msg):
+        # show quick debug info so user can see the path used
+        st.info(f"Using uploaded file: `{uploaded_saved_path}`")
         try:
-            frac = float(frac)
+            # list contents (helpful for remote debugging)
+            st.write("Contents of input_data:", [p.name for p in INPUT_DIR.iterdir()])
         except Exception:
-            frac = 0.0
-        frac = max(0.0, min(1.0, frac))
-        progress.progress(frac)
-        # use info for running messages, success/error replaced below
-        progress_msg.info(msg)
-
-    with st.status("Running notebook…", expanded=True) as status:
-        success, message = run_notebook(
-            NOTEBOOK_PATH,
-            Path(uploaded_saved_path),
-            OUTPUT_DIR,
-            on_progress=on_progress
-        )
+            pass
+
+        # the notebook overwrites outputs in place; release any cached handles on them first
+        _calamine_workbook.clear()
+        nb_job = _start_notebook_job(NOTEBOOK_PATH, Path(uploaded_saved_path), OUTPUT_DIR)
+        st.session_state["nb_job"] = nb_job
 
+if nb_job is not None:
+    # drain progress updates posted by the worker since the last rerun
+    frac, msg = nb_job["progress"]
+    while True:
+        try:
+            frac, msg = nb_job["queue"].get_nowait()
+        except queue.Empty:
+            break
+    nb_job["progress"] = (frac, msg)
+
+    if nb_job["result"] is None:
+        with st.status("Running notebook…", expanded=True):
+            st.progress(frac)
+            # use info for running messages, success/error replaced below
+            st.info(msg)
+    else:
+        if not nb_job.get("outputs_rescanned"):
+            # pick up the notebook's final outputs now rather than after the scan ttl
+            _scan_outputs.clear()
+            nb_job["outputs_rescanned"] = True
+        success, message = nb_job["result"]
         if success:
-            progress.progress(1.0)
-            progress_msg.success("Done!")
-            status.update(label="Notebook finished ✅", state="complete", expanded=False)
+            st.progress(1.0)
             st.success("Notebook finished successfully.")
             st.text(message)
         else:
-            status.update(label="Notebook failed ❌", state="error", expanded=True)
             st.error("Notebook failed.")
             st.text(message)
 
+    if nb_job["result"] is None:
+        # Poll the background run: rerun every NOTEBOOK_POLL_SECONDS so the progress bar moves.
+        # The outputs section below is skipped meanwhile (the notebook is still rewriting those
+        # files, and rendering it would re-read every listed workbook once per poll), so no
+        # save/download widget can be used mid-poll. Note the sleep itself can't be
+        # interrupted: a click is picked up after at most one poll interval.
+        st.info("Output files are listed here once the notebook run has finished.")
+        time.sleep(NOTEBOOK_POLL_SECONDS)
+        st.rerun()
+
 
 # ---------------------
 # Output files display (always shown)
@@ -204,11 +500,18 @@ st.info(
     "- CSV masks (`*_highlighted_cells.csv`, `*_sigGreen_highlighted_cells.csv`) help build nicer previews"
 )
 
-groups = group_outputs_by_table(OUTPUT_DIR)
+output_entries = _scan_outputs(str(OUTPUT_DIR))
+groups = _cached_groups(output_entries)
+
+# Highlights files per table, filtered once per rerun and reused by every section below
+highlight_index = {
+    table_title: [f for f in files if _is_highlights_name(f.name)]
+    for table_title, files in groups.items()
+}
 
 # DEBUG: show what's in the three important folders
 st.write("DEBUG INPUT_DIR:", [p.name for p in INPUT_DIR.glob("*")])
-st.write("DEBUG HIGHLIGHTED_OUTPUTS:", [p.name for p in OUTPUT_DIR.glob("*")])
+st.write("DEBUG HIGHLIGHTED_OUTPUTS:", [name for name, *_ in output_entries])
 st.write("DEBUG EXPORT_DIR:", [p.name for p in EXPORT_DIR.glob("*")])
 st.write("DEBUG grouped keys:", list(groups.keys()))
 
@@ -218,17 +521,9 @@ st.write("DEBUG grouped keys:", list(groups.keys()))
 st.markdown("### Select table (type to search)")
 
 # Only include tables that actually have _Highlights files
-all_table_titles = []
-
-for table_title, files in groups.items():
-    has_highlights = any(
-        "_highlights" in f.name.lower() and "sigtesttable" not in f.name.lower()
-        for f in files
-    )
-    if has_highlights and table_title:
-        all_table_titles.append(table_title)
-
-all_table_titles = sorted(all_table_titles)
+all_table_titles = sorted(
+    table_title for table_title, files in highlight_index.items() if files and table_title
+)
 
 selected_table = st.selectbox(
     "Start typing to filter tables (e.g. 'A1', 'Table 3', 'Gender')",
@@ -244,11 +539,7 @@ st.markdown("## Global column filter (optional)")
 st.caption("Pick columns once and apply to all tables by default. You can still override per table below.")
 
 # Find one sample Highlights file to extract possible columns
-all_highlight_files = []
-for t in groups.values():
-    for f in t:
-        if "_highlights" in f.name.lower() and "sigtesttable" not in f.name.lower():
-            all_highlight_files.append(f)
+all_highlight_files = [f for files in highlight_index.values() for f in files]
 
 sample_file = all_highlight_files[0] if all_highlight_files else None
 global_cols_options = get_excel_columns(sample_file) if sample_file else []
@@ -275,8 +566,11 @@ else:
     # find global CSV fallbacks (if any)
     global_red_csv = None
     global_green_csv = None
-    for c in OUTPUT_DIR.glob("*.csv"):
-        name = c.name.lower()
+    for fname, fpath_str, _, _ in output_entries:
+        if not fname.endswith(".csv"):
+            continue
+        c = Path(fpath_str)
+        name = fname.lower()
         if "siggreen" in name or "sig_green" in name:
             global_green_csv = c
         elif "highlighted_cells" in name or name.startswith("highlighted"):
@@ -291,17 +585,14 @@ else:
     else:
         table_titles = [selected_table]
 
-        
+    # Read the headers of every file about to be rendered up front, in parallel
+    headers = prefetch_excel_headers(
+        [f for table_title in table_titles for f in highlight_index.get(table_title, [])]
+    )
+
     for table_title in table_titles:
-        # Only keep "Highlights" files AND explicitly exclude SigTestTable outputs
-        files = [
-            f
-            for f in groups[table_title]
-            if (
-                "_highlights" in f.name.lower()
-                and "sigtesttable" not in f.name.lower()
-            )
-        ]
+        # Only "Highlights" files (SigTestTable outputs already excluded by the index)
+        files = highlight_index[table_title]
 
         # If this table group doesn't contain any valid Highlights file, skip it
         if not files:
@@ -319,32 +610,13 @@ else:
         for fpath in files:
             st.write(f"**{fpath.name}**")
 
-            # Try to read just the first row to present sample values / column names
-            try:
-                sample_df = None
-                # read header + first data row (if header present)
-                try:
-                    sample_df = pd.read_excel(fpath, engine="openpyxl", nrows=1, header=0)
-                    header_present = True
-                except Exception:
-                    # fallback: read without header
-                    sample_df = pd.read_excel(fpath, engine="openpyxl", nrows=1, header=None)
-                    header_present = False
-
-                if sample_df is None or sample_df.empty:
-                    st.info("No data available in this file.")
-                    cols = []
-                else:
-                    # if header_present True, column names are in sample_df.columns
-                    cols = [
-                        str(c)
-                        for c in sample_df.columns
-                        if c is not None and not str(c).strip().lower().startswith("unnamed")
-                    ]
-
-            except Exception as e:
-                st.error(f"Could not read {fpath.name}: {e}")
+            # Read just the header row to present column names
+            cols = headers.get(fpath, [])
+            if isinstance(cols, Exception):
+                st.error(f"Could not read {fpath.name}: {cols}")
                 cols = []
+            elif not cols:
+                st.info("No data available in this file.")
 
             # Show a collapsible area with the column selector and sample values
             with st.expander(f"Select columns to KEEP for {fpath.name}", expanded=False):
@@ -410,130 +682,114 @@ else:
                             st.warning("No columns selected — nothing to save.")
                         else:
                             try:
-                                import shutil
-                                from openpyxl import load_workbook
-                                import re
-
-                                # Prepare export path and copy original file into export_files (overwrite)
                                 # Prepare export filename: replace _Highlights with _Final
                                 export_name = fpath.name
-                                export_name = re.sub(r'_Highlights\.xlsx$', '_Final.xlsx', export_name, flags=re.IGNORECASE)
+                                export_name = _HIGHLIGHTS_RE.sub('_Final.xlsx', export_name)
 
                                 dest_path = EXPORT_DIR / export_name
-                                shutil.copy2(fpath, dest_path)
-
-
-                                # --- LOAD workbook and WS first (must set ws before any ws operations) ---
-                                wb = load_workbook(filename=str(dest_path))
-                                ws = wb.active   # operate on active sheet (this modifies the existing sheet, not create a new one)
-
-                                # --- Insert a new top row and write the cleaned title into A1 ---
-                                # (This **shifts the header/data down by 1** so header_row becomes 2)
-                                ws.insert_rows(1)
 
                                 # Build clean title from filename: take part before _Highlights, remove underscores
                                 stem = fpath.stem
-                                clean_title = re.sub(r'(_Highlights|_highlighted|_Green_highlighted|_SigTestTable|_SigTestTable_Highlights).*$', '', stem, flags=re.IGNORECASE)
+                                clean_title = _TITLE_RE.sub('', stem)
                                 clean_title = clean_title.replace("_", " ").strip()
 
-                                # Write title into first cell of the same sheet (A1)
-                                ws.cell(row=1, column=1, value=clean_title)
-
-                                # Header row has moved down by 1
-                                header_row = 2
-
-                                # --- Read header values from the header_row (1-based) ---
-                                header_values = []
-                                max_col = ws.max_column if ws.max_column is not None else 0
-                                for col_idx in range(1, max_col + 1):
-                                    v = ws.cell(row=header_row, column=col_idx).value
-                                    header_values.append("" if v is None else str(v).strip())
-
-                                # Normalize user selection to strings
-                                normalized_keep = [str(x).strip() for x in keep_cols]
-
-                                # ALWAYS preserve the first column (index 1)
-                                if len(header_values) >= 1:
-                                    first_col_name = header_values[0]
-                                    if first_col_name not in normalized_keep:
-                                        normalized_keep.insert(0, first_col_name)
-                                        st.info(f"First column '{first_col_name}' is always preserved and has been added to your selection.")
-
-                                # ALWAYS preserve the "Total" column (case-insensitive)
-                                # (If the file doesn't have a Total column, nothing happens.)
-                                for h in header_values:
-                                    if h and str(h).strip().lower() == "total":
-                                        total_col_name = str(h).strip()
-                                        if total_col_name not in normalized_keep:
+                                # --- Stream the source sheet (read_only) into a fresh write_only workbook ---
+                                # Only kept columns are ever written, so no delete_cols / full DOM load.
+                                src_wb = load_workbook(filename=str(fpath), read_only=True, data_only=True)
+                                try:
+                                    src_ws = src_wb.active
+                                    rows_iter = src_ws.iter_rows()
+
+                                    # --- Read header values from the first source row ---
+                                    # (in the output the title goes into A1, so the header lands on row 2)
+                                    header_row = 2
+                                    header_cells = next(rows_iter, ())
+                                    header_values = ["" if c.value is None else str(c.value).strip() for c in header_cells]
+
+                                    # Normalize user selection to strings
+                                    normalized_keep = [str(x).strip() for x in keep_cols]
+                                    # casefolded set for O(1), case-insensitive membership tests
+                                    keep_cf = {name.casefold() for name in normalized_keep}
+
+                                    # ALWAYS preserve the first column (index 1)
+                                    if len(header_values) >= 1:
+                                        first_col_name = header_values[0]
+                                        if first_col_name.casefold() not in keep_cf:
+                                            normalized_keep.insert(0, first_col_name)
+                                            keep_cf.add(first_col_name.casefold())
+                                            st.info(f"First column '{first_col_name}' is always preserved and has been added to your selection.")
+
+                                    # ALWAYS preserve the "Total" column (case-insensitive)
+                                    # (If the file doesn't have a Total column, nothing happens.)
+                                    if "total" not in keep_cf:
+                                        total_col_name = next((h for h in header_values if h.casefold() == "total"), None)
+                                        if total_col_name is not None:
                                             normalized_keep.append(total_col_name)
+                                            keep_cf.add("total")
                                             st.info("Column 'Total' is always preserved and has been added to your selection.")
 
-                                # If header row is empty, abort early to avoid destructive edits
-                                if not header_values or all(h == "" for h in header_values):
-                                    st.warning(f"No header found in `{fpath.name}` at row {header_row}. Aborting filtered save.")
-                                else:
-                                    # Build list of 1-based indices to delete (skip first column index 1)
-                                    cols_to_delete = [
-                                        idx for idx, name in enumerate(header_values, start=1)
-                                        if idx != 1 and (name not in normalized_keep)
-                                    ]
-
-                                    # Delete from right -> left so indices don't shift unexpectedly
-                                    for col_idx in sorted(cols_to_delete, reverse=True):
-                                        if 1 <= col_idx <= ws.max_column:
-                                            ws.delete_cols(col_idx)
-                                    # --- Apply decimal place rounding to the row containing 'Base' ---
-                                    try:
-                                        target_row = None
-
-                                        # Look for the row that contains the value "Base" (case-insensitive)
-                                        for r in range(header_row + 1, ws.max_row + 1):
-                                            for c in range(1, ws.max_column + 1):
-                                                v = ws.cell(row=r, column=c).value
-                                                if v is not None and str(v).strip().lower() == "base":
-                                                    target_row = r
-                                                    break
-                                            if target_row:
-                                                break
-
-                                        # If found, round numeric values in that row
-                                        if target_row:
-                                            for c in range(1, ws.max_column + 1):
-                                                cell = ws.cell(row=target_row, column=c)
-                                                val = cell.value
-
-                                                if isinstance(val, (int, float)):
-                                                    cell.value = round(val, int(decimal_places))
-                                                else:
-                                                    # handle numeric strings like "12.345"
-                                                    try:
-                                                        num = float(str(val))
-                                                        cell.value = round(num, int(decimal_places))
-                                                    except Exception:
-                                                        pass  # leave non-numeric values unchanged
-
-                                            st.info("Rounded values in 'Base' row to nearest whole number.")
-
-
-                                    except Exception as _e:
-                                        st.warning(f"Could not apply rounding to 'Base' row: {_e}")
-
-                                    # Save workbook back to dest_path (overwrites copy in export_files)
-                                    wb.save(filename=str(dest_path))
-                                    wb.close()
-
-                                    st.success(f"Saved filtered file to `export_files/{dest_path.name}` (kept {len(normalized_keep)} columns).")
+                                    # If header row is empty, abort early (nothing is written)
+                                    if not header_values or all(h == "" for h in header_values):
+                                        st.warning(f"No header found in `{fpath.name}` at row {header_row}. Aborting filtered save.")
+                                        dest_path = None
+                                    else:
+                                        # 0-based indices of the columns to keep (first column always kept)
+                                        keep_idx = [
+                                            idx for idx, name in enumerate(header_values)
+                                            if idx == 0 or name.casefold() in keep_cf
+                                        ]
+
+                                        dst_wb = Workbook(write_only=True)
+                                        dst_ws = dst_wb.create_sheet(src_ws.title)
+
+                                        # Title into A1, then the filtered header row
+                                        dst_ws.append([clean_title])
+                                        dst_ws.append([_copy_cell_for_write(dst_ws, header_cells[i]) for i in keep_idx])
+
+                                        # Copy kept cells row by row; the first row labelled 'Base' is
+                                        # rounded in the same pass, so the sheet is only traversed once.
+                                        # The label lives in column A (always kept -> out[0]), and once it
+                                        # has been found no further rows are checked.
+                                        base_rounded = False
+                                        for row in rows_iter:
+                                            out = [_copy_cell_for_write(dst_ws, row[i]) if i < len(row) else None for i in keep_idx]
+
+                                            label = out[0].value if out[0] is not None else None
+                                            if not base_rounded and label is not None and str(label).strip().lower() == "base":
+                                                base_rounded = True
+                                                try:
+                                                    for cell in out:
+                                                        if cell is None:
+                                                            continue
+                                                        val = cell.value
+                                                        if isinstance(val, (int, float)):
+                                                            cell.value = round(val, int(decimal_places))
+                                                        elif _is_numeric_str(val):
+                                                            # handle numeric strings like "12.345"
+                                                            cell.value = round(float(val), int(decimal_places))
+                                                    st.info("Rounded values in 'Base' row to nearest whole number.")
+                                                except Exception as _e:
+                                                    st.warning(f"Could not apply rounding to 'Base' row: {_e}")
+
+                                            dst_ws.append(out)
+
+                                        # Save the filtered workbook to dest_path (overwrites any earlier export)
+                                        dst_wb.save(filename=str(dest_path))
+                                finally:
+                                    src_wb.close()
+
+                                if dest_path is not None:
+                                    st.success(f"Saved filtered file to `export_files/{dest_path.name}` (kept {len(keep_idx)} columns).")
 
                                     # Provide immediate download for the edited file
                                     try:
-                                        with open(dest_path, "rb") as fh:
-                                            st.download_button(
-                                                label=f"Download FINAL {dest_path.name}",
-                                                data=fh.read(),
-                                                file_name=dest_path.name,
-                                                mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-                                                key=f"dl_{dest_path.name}"
-                                            )
+                                        file_download_button(
+                                            dest_path,
+                                            label=f"Download FINAL {dest_path.name}",
+                                            key=f"dl_{dest_path.name}",
+                                            # only exists on the run that saved it; a Prepare click would rerun it away
+                                            deferred=False,
+                                        )
                                     except Exception as e:
                                         st.warning(f"Saved file but could not create download button: {e}")
 
@@ -542,14 +798,10 @@ else:
 
                     # Original download button for the unchanged highlighted file (always visible)
                     try:
-                        data_bytes = fpath.read_bytes()
-                        mime = mimetypes.guess_type(fpath.name)[0] or "application/octet-stream"
-                        st.download_button(
+                        file_download_button(
+                            fpath,
                             label=f"Download original {fpath.name}",
-                            data=data_bytes,
-                            file_name=fpath.name,
-                            mime=mime,
-                            key=f"orig_dl_{fpath.name}"
+                            key=f"orig_dl_{fpath.name}",
                         )
                     except Exception as e:
                         st.write(f"_Download not available for original: {e}_")
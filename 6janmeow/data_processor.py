@@ -1,14 +1,39 @@
 # data_processor.py
 from pathlib import Path
 import pandas as pd
+import numpy as np
 import openpyxl
 import html
 from typing import Optional, Set, Tuple, Dict
 import re
+from collections import defaultdict
+from functools import lru_cache
+from itertools import islice
 
 # correct import for column index conversion
 from openpyxl.utils.cell import column_index_from_string
 
+# compiled once at import; used per CSV row / per file
+_ADDR_RE = re.compile(r"^([A-Za-z]+)(\d+)$")
+_SUFFIX_RE = re.compile(
+    r'(_Green|_highlighted|_SigTestTable|_SigTestTable_Green|_highlighted_cells|_cells)$',
+    re.IGNORECASE,
+)
+
+# shared <style> block for the preview tables, built once at import
+_PREVIEW_CSS = """
+    <style>
+    table.excel-preview { border-collapse: collapse; font-family: Arial, Helvetica, sans-serif; width: 100%; }
+    table.excel-preview th, table.excel-preview td { border: 1px solid #ddd; padding: 6px 8px; text-align: left; vertical-align: top; }
+    table.excel-preview th { background:#f6f6f6; font-weight:600; }
+    </style>
+    """
+
+# cell openers for the combined preview; unhighlighted cells carry no style attribute
+_TD_GREEN_OPEN = "<td style='background:#C6EFCE;'>"
+_TD_RED_OPEN = "<td style='background:#FFC7CE;'>"
+_TD_OPEN = "<td>"
+
 # ---------- simple preview ----------
 def preview_file(path: Path, nrows: int = 10):
     """
@@ -19,13 +44,14 @@ def preview_file(path: Path, nrows: int = 10):
     if not path.exists():
         return None
     try:
+        # nrows is pushed down to the reader so only the preview rows are parsed
         if path.suffix.lower() in [".xlsx", ".xls"]:
-            df = pd.read_excel(path, engine="openpyxl")
+            df = pd.read_excel(path, engine="openpyxl", nrows=nrows)
         elif path.suffix.lower() == ".csv":
-            df = pd.read_csv(path)
+            df = pd.read_csv(path, nrows=nrows)
         else:
             return pd.DataFrame({"info": [f"Unsupported file type: {path.suffix}"]})
-        return df.head(nrows)
+        return df
     except Exception as e:
         return pd.DataFrame({"error": [str(e)]})
 
@@ -35,17 +61,90 @@ def _openpyxl_color_to_hex(openpyxl_color) -> Optional[str]:
     Convert openpyxl Color (fgColor.rgb or similar) to HEX string like #RRGGBB.
     Returns None if color not found.
     """
-    if openpyxl_color is None:
+    try:
+        rgb = openpyxl_color.rgb
+    except AttributeError:
         return None
-    rgb = getattr(openpyxl_color, "rgb", None)
-    if rgb:
-        rgb = rgb.upper()
-        if len(rgb) == 8 and rgb.startswith("FF"):
-            rgb = rgb[2:]
-        if len(rgb) == 6:
-            return f"#{rgb}"
+    # theme/indexed colours expose a descriptor object here, not a hex string
+    if type(rgb) is not str or not rgb:
+        return None
+    n = len(rgb)
+    # only opaque ARGB counts: "00000000" is openpyxl's default for "no fill"
+    if n == 8 and rgb[0] in "Ff" and rgb[1] in "Ff":
+        return "#" + rgb[2:].upper()
+    if n == 6:
+        return "#" + rgb.upper()
     return None
 
+def _memo_escape():
+    """
+    Return an html.escape(str(v)) that remembers each distinct text it has seen.
+    Meant to live for one render: sig-test tables repeat the same values a lot.
+    """
+    cache: Dict[str, str] = {}
+
+    def esc(v) -> str:
+        s = v if type(v) is str else str(v)
+        r = cache.get(s)
+        if r is None:
+            r = cache[s] = html.escape(s)
+        return r
+
+    return esc
+
+def _read_sheet_window(path: Path, nrows: int, max_cols: int) -> list:
+    """
+    Read the first nrows + 1 rows (header + data) of the active sheet as cell tuples,
+    at most max_cols wide, in one read_only pass.
+    """
+    wb = openpyxl.load_workbook(filename=str(path), read_only=True, data_only=True, keep_links=False)
+    try:
+        ws = wb.active
+        return [tuple(r) for r in islice(ws.iter_rows(max_col=max_cols), nrows + 1)]
+    finally:
+        # read_only keeps the file open; values and style ids are already in memory
+        wb.close()
+
+def _window_values(cell_rows: list) -> list:
+    """
+    Cell rows -> value tuples. Error cells become None, as pandas reads them as NaN:
+    the notebook writes every missing value as #NUM! (nan_inf_to_errors).
+    """
+    return [tuple(None if c.data_type == "e" else c.value for c in row) for row in cell_rows]
+
+def _split_header(rows: list, nrows: int) -> Tuple[list, list, bool]:
+    """
+    Split raw value rows into (columns, data_rows, header_present), like
+    pd.read_excel(header=0): row 1 is always the header, blank header cells become
+    "Unnamed: i" and repeats get ".1", ".2". Trailing empty columns are dropped.
+    header_present is False only for an empty sheet.
+    """
+    width = 0
+    for row in rows:
+        for i in range(len(row) - 1, width - 1, -1):
+            if row[i] is not None:
+                width = i + 1
+                break
+
+    header_present = bool(rows)
+    columns = []
+    seen: Dict[str, int] = {}
+    for i, v in enumerate(rows[0][:width] if rows else ()):
+        name = f"Unnamed: {i}" if v is None else v
+        if name in seen:
+            seen[name] += 1
+            name = f"{name}.{seen[name]}"
+        else:
+            seen[name] = 0
+        columns.append(name)
+
+    data = [tuple(r[:width]) for r in rows[1:nrows + 1]]
+    # a short read means the sheet ended; drop its trailing blank rows as pandas does
+    if len(rows) <= nrows:
+        while data and all(v is None for v in data[-1]):
+            data.pop()
+    return columns, data, header_present
+
 def preview_file_with_styles(path: Path, nrows: int = 10, max_cols: int = 20) -> Optional[str]:
     """
     Return HTML table (string) that shows first nrows with background fills from Excel.
@@ -62,72 +161,63 @@ def preview_file_with_styles(path: Path, nrows: int = 10, max_cols: int = 20) ->
         # styles not supported for CSV
         return None
 
-    # read values via pandas
+    # values and fills come from the same single openpyxl pass over the preview window
     try:
-        try:
-            df = pd.read_excel(path, engine="openpyxl", header=0)
-            header_present = True
-        except Exception:
-            df = pd.read_excel(path, engine="openpyxl", header=None)
-            header_present = False
+        cell_rows = _read_sheet_window(path, nrows, max_cols)
     except Exception as e:
         return f"<pre>Could not read Excel file: {html.escape(str(e))}</pre>"
 
-    # limit rows and cols
-    df_preview = df.head(nrows).iloc[:, :max_cols]
-
-    # openpyxl workbook to read fills
-    try:
-        wb = openpyxl.load_workbook(filename=str(path), read_only=False, data_only=True)
-        ws = wb.active
-    except Exception as e:
-        return f"<pre>Could not open workbook for styles: {html.escape(str(e))}</pre>"
+    columns, data_rows, header_present = _split_header(_window_values(cell_rows), nrows)
+    # header row (if any) is Excel row 1, so data starts one cell row further down
+    style_rows = cell_rows[1:] if header_present else cell_rows
 
     # CSS + table build
-    css = """
-    <style>
-    table.excel-preview { border-collapse: collapse; font-family: Arial, Helvetica, sans-serif; width: 100%; }
-    table.excel-preview th, table.excel-preview td { border: 1px solid #ddd; padding: 6px 8px; text-align: left; vertical-align: top; }
-    table.excel-preview th { background:#f6f6f6; font-weight:600; }
-    </style>
-    """
+    css = _PREVIEW_CSS
 
-    html_rows = []
+    # All markup goes into one flat list and is joined once at the end
+    parts = []
+    esc = _memo_escape()
 
     # Build header row
-    header_cells = []
-    for col_idx, col_name in enumerate(df_preview.columns, start=1):
-        header_cells.append(f"<th>{html.escape(str(col_name))}</th>")
-    html_rows.append("<tr>" + "".join(header_cells) + "</tr>")
-
-    # Data rows
-    # If header_present True -> pandas row 0 maps to Excel row 2 (Excel header at row1).
-    # If header_present False -> pandas row 0 maps to Excel row 1.
-    for ridx, (_, row_series) in enumerate(df_preview.iterrows()):
-        cells_html = []
-        excel_row_num = (2 + ridx) if header_present else (1 + ridx)
-        for cidx, col_name in enumerate(df_preview.columns, start=1):
-            try:
-                cell_value = row_series.iloc[cidx - 1]
-            except Exception:
-                cell_value = row_series[cidx - 1]
-            text = "" if pd.isna(cell_value) else str(cell_value)
-            # Get openpyxl cell to inspect fill
-            try:
-                wb_cell = ws.cell(row=excel_row_num, column=cidx)
-                fill = getattr(wb_cell, "fill", None)
-                bg = None
-                if fill:
-                    fg = getattr(fill, "fgColor", None)
-                    bg = _openpyxl_color_to_hex(fg) if fg is not None else None
-                style_attr = f" style='background:{bg};'" if (bg is not None) else ""
-            except Exception:
-                style_attr = ""
-            cells_html.append(f"<td{style_attr}>{html.escape(text)}</td>")
-        html_rows.append("<tr>" + "".join(cells_html) + "</tr>")
-
-    table_html = f"{css}<table class='excel-preview'>{''.join(html_rows)}</table>"
-    return table_html
+    parts.append("<tr>")
+    for col_name in columns:
+        parts.extend(("<th>", esc(col_name), "</th>"))
+    parts.append("</tr>")
+
+    c2h = _openpyxl_color_to_hex  # closure lookup instead of a global per cell
+
+    def cell_bg(wb_cell):
+        try:
+            fill = getattr(wb_cell, "fill", None)
+            if fill:
+                return c2h(fill.fgColor)
+        except Exception:
+            pass
+        return None
+
+    # Resolve fills in one pass up front. Raw extracts usually have none, and then the
+    # row loop emits bare cells without any per-cell style lookups.
+    width = len(columns)
+    bg_rows = [[cell_bg(c) for c in row[:width]] for row in style_rows[:len(data_rows)]]
+    any_fill = any(bg is not None for row in bg_rows for bg in row)
+
+    for ridx, row_values in enumerate(data_rows):
+        parts.append("<tr>")
+        if not any_fill:
+            for cell_value in row_values:
+                text = "" if cell_value is None else esc(cell_value)
+                parts.extend(("<td>", text, "</td>"))
+        else:
+            # rows can come back shorter than the window -> no fill for missing cells
+            bg_row = bg_rows[ridx] if ridx < len(bg_rows) else ()
+            for cidx, cell_value in enumerate(row_values):
+                text = "" if cell_value is None else esc(cell_value)
+                bg = bg_row[cidx] if cidx < len(bg_row) else None
+                td_open = f"<td style='background:{bg};'>" if (bg is not None) else "<td>"
+                parts.extend((td_open, text, "</td>"))
+        parts.append("</tr>")
+
+    return "".join((css, "<table class='excel-preview'>", *parts, "</table>"))
 
 # ---------- helpers for CSV-based combined highlight (green/red) ----------
 
@@ -139,7 +229,11 @@ def _parse_cell_address_token(tok: str) -> Optional[Tuple[int, int]]:
     tok = str(tok).strip()
     if not tok:
         return None
-    m = re.match(r"^([A-Za-z]+)(\d+)$", tok)
+    # cheap rejects before the regex: an address starts with an ASCII letter and ends with a digit
+    c0 = tok[0]
+    if not ("A" <= c0 <= "Z" or "a" <= c0 <= "z") or not ("0" <= tok[-1] <= "9"):
+        return None
+    m = _ADDR_RE.match(tok)
     if m:
         col_letters = m.group(1)
         row_num = int(m.group(2))
@@ -150,15 +244,35 @@ def _parse_cell_address_token(tok: str) -> Optional[Tuple[int, int]]:
             return None
     return None
 
+@lru_cache(maxsize=1024)
+def _col_letters_to_index(letters: str) -> Optional[int]:
+    """
+    Column letters (upper case) -> 1-based column index, memoized; None if out of range.
+    """
+    try:
+        return column_index_from_string(letters)
+    except Exception:
+        return None
+
 def _parse_highlight_csv(path: Path) -> Dict[str, Set[Tuple[int,int]]]:
     """
     Parse a highlighted-cells CSV into a dict keyed by optional 'table' or 'sheet' or filename,
     mapping to a set of (excel_row, excel_col) pairs (1-based).
+    The result is cached per (path, mtime, size) and shared between callers: treat it as read-only.
     """
     path = Path(path)
-    if not path.exists():
+    try:
+        st = path.stat()
+    except OSError:
         return {}
+    return _parse_highlight_csv_cached(str(path), st.st_mtime_ns, st.st_size)
 
+@lru_cache(maxsize=32)
+def _parse_highlight_csv_cached(path_str: str, mtime_ns: int, size: int) -> Dict[str, Set[Tuple[int,int]]]:
+    """
+    Uncached parse behind _parse_highlight_csv; mtime_ns/size only key the cache.
+    """
+    path = Path(path_str)
     try:
         df = pd.read_csv(path, dtype=str)
     except Exception:
@@ -180,42 +294,56 @@ def _parse_highlight_csv(path: Path) -> Dict[str, Set[Tuple[int,int]]]:
     def add_coord(key: str, row: int, col: int):
         results.setdefault(key, set()).add((row, col))
 
-    for _, row in df.iterrows():
-        key = "__ALL__" if table_key_col is None else (row.get(table_key_col) or "__ALL__")
-        # Try direct address cell
-        if "cell" in cols:
-            tok = row.get(cols["cell"])
-            parsed = _parse_cell_address_token(tok) if pd.notna(tok) else None
-            if parsed:
-                add_coord(key, parsed[0], parsed[1])
-                continue
-        if "address" in cols:
-            tok = row.get(cols["address"])
-            parsed = _parse_cell_address_token(tok) if pd.notna(tok) else None
-            if parsed:
-                add_coord(key, parsed[0], parsed[1])
-                continue
+    # Direct address columns ("cell", then "address") are parsed in one vectorized
+    # pass; the first column giving a valid address wins for each row.
+    addr_row = pd.Series(pd.NA, index=df.index, dtype="Int64")
+    addr_col = pd.Series(pd.NA, index=df.index, dtype="Int64")
+    for name in ("cell", "address"):
+        if name not in cols:
+            continue
+        m = df[cols[name]].str.strip().str.extract(_ADDR_RE.pattern, expand=True)
+        col_idx = m[0].str.upper().map(_col_letters_to_index, na_action="ignore")
+        # row numbers too long for int64 can't be a real sheet row: treat them as unparseable
+        ok = col_idx.notna() & addr_row.isna() & (m[1].str.len() <= 18)
+        if ok.any():
+            addr_row[ok] = m.loc[ok, 1].astype("int64")
+            addr_col[ok] = col_idx[ok].astype("int64")
+
+    hit = addr_row.notna()
+    if hit.any():
+        if table_key_col is None:
+            keys = pd.Series("__ALL__", index=df.index)
+        else:
+            keys = df[table_key_col].replace("", "__ALL__")
+        found = pd.DataFrame({"key": keys[hit], "row": addr_row[hit], "col": addr_col[hit]})
+        for key, g in found.groupby("key", sort=False, dropna=False):
+            results.setdefault(key, set()).update(zip(g["row"].tolist(), g["col"].tolist()))
+
+    # Remaining rows fall back to numeric row/col or a generic scan. Column positions
+    # are resolved once; rows are read positionally from plain tuples (itertuples).
+    def pos(name):
+        return df.columns.get_loc(cols[name]) if name in cols else None
+
+    key_pos = None if table_key_col is None else df.columns.get_loc(table_key_col)
+    row_positions = [p for p in map(pos, ("row", "r", "excel_row", "row_index")) if p is not None]
+    col_positions = [p for p in map(pos, ("col", "c", "column", "col_index")) if p is not None]
+    all_positions = range(len(df.columns))
+
+    def first_int(tup, positions):
+        for p in positions:
+            val = tup[p]
+            if pd.notna(val):
+                try:
+                    return int(float(val))
+                except Exception:
+                    pass
+        return None
+
+    for tup in df[~hit].itertuples(index=False, name=None):
+        key = "__ALL__" if key_pos is None else (tup[key_pos] or "__ALL__")
         # Try numeric row/col (various names)
-        r = None
-        c = None
-        for rc in ("row", "r", "excel_row", "row_index"):
-            if rc in cols:
-                val = row.get(cols[rc])
-                if pd.notna(val):
-                    try:
-                        r = int(float(val))
-                        break
-                    except Exception:
-                        r = None
-        for cc in ("col", "c", "column", "col_index"):
-            if cc in cols:
-                val = row.get(cols[cc])
-                if pd.notna(val):
-                    try:
-                        c = int(float(val))
-                        break
-                    except Exception:
-                        c = None
+        r = first_int(tup, row_positions)
+        c = first_int(tup, col_positions)
         if r is not None and c is not None:
             if r >= 1 and c >= 1:
                 add_coord(key, r, c)
@@ -223,8 +351,8 @@ def _parse_highlight_csv(path: Path) -> Dict[str, Set[Tuple[int,int]]]:
                 add_coord(key, r + 1, c + 1)
             continue
         # If generic coordinate-like value present, try parse it
-        for possible in df.columns:
-            val = row.get(possible)
+        for p in all_positions:
+            val = tup[p]
             if pd.notna(val):
                 parsed = _parse_cell_address_token(val)
                 if parsed:
@@ -237,16 +365,16 @@ def _excel_coords_to_df_indices(coords: Set[Tuple[int,int]], header_present: boo
     """
     Map excel coordinates (row, col) 1-based to dataframe (r_idx, c_idx) 0-based.
     """
-    out = set()
-    for erow, ecol in coords:
-        if header_present:
-            df_r = erow - 2
-        else:
-            df_r = erow - 1
-        df_c = ecol - 1
-        if df_r >= 0 and df_c >= 0:
-            out.add((df_r, df_c))
-    return out
+    row_off = 2 if header_present else 1
+    # shift all pairs at once as an (n, 2) array; header row 1 means data starts at row 2
+    try:
+        arr = np.fromiter((v for pair in coords for v in pair), dtype=np.int64, count=2 * len(coords)).reshape(-1, 2)
+    except OverflowError:
+        # the numeric row/col fallback can yield ints beyond int64 (e.g. "1e20"): shift in Python
+        return {(r - row_off, c - 1) for r, c in coords if r - row_off >= 0 and c - 1 >= 0}
+    arr -= np.array([row_off, 1], dtype=np.int64)
+    mask = (arr >= 0).all(axis=1)
+    return set(map(tuple, arr[mask].tolist()))
 
 def build_combined_highlight_html(
     excel_path: Path,
@@ -262,25 +390,20 @@ def build_combined_highlight_html(
     p = Path(excel_path)
     if not p.exists():
         return None
-    # read dataframe with header detection
+    # values straight from one openpyxl read_only pass, with header detection
     try:
-        try:
-            df = pd.read_excel(p, engine="openpyxl", header=0)
-            header_present = True
-        except Exception:
-            df = pd.read_excel(p, engine="openpyxl", header=None)
-            header_present = False
+        rows = _window_values(_read_sheet_window(p, nrows, max_cols))
     except Exception as e:
         return f"<pre>Could not read Excel file: {html.escape(str(e))}</pre>"
 
-    df_preview = df.head(nrows).iloc[:, :max_cols]
+    columns, data_rows, header_present = _split_header(rows, nrows)
 
     # parse companion CSVs
     green_coords = set()
     red_coords = set()
 
     base_key_guess = p.stem
-    base_key_guess = re.sub(r'(_Green|_highlighted|_SigTestTable|_SigTestTable_Green|_highlighted_cells|_cells)$', '', base_key_guess, flags=re.IGNORECASE)
+    base_key_guess = _SUFFIX_RE.sub('', base_key_guess)
 
     def extract_coords_from_csv(csv_path: Optional[Path], collect_set: Set[Tuple[int,int]]):
         if csv_path is None or not Path(csv_path).exists():
@@ -305,35 +428,40 @@ def build_combined_highlight_html(
     green_df_coords = _excel_coords_to_df_indices(green_coords, header_present)
     red_df_coords = _excel_coords_to_df_indices(red_coords, header_present)
 
+    # index highlights by row so each cell only probes a small per-row set of columns
+    green_by_row = defaultdict(set)
+    for r, c in green_df_coords:
+        green_by_row[r].add(c)
+    red_by_row = defaultdict(set)
+    for r, c in red_df_coords:
+        red_by_row[r].add(c)
+
     # Build HTML
-    css = """
-    <style>
-    table.excel-preview { border-collapse: collapse; font-family: Arial, Helvetica, sans-serif; width: 100%; }
-    table.excel-preview th, table.excel-preview td { border: 1px solid #ddd; padding: 6px 8px; text-align: left; vertical-align: top; }
-    table.excel-preview th { background:#f6f6f6; font-weight:600; }
-    </style>
-    """
-    html_rows = []
+    css = _PREVIEW_CSS
+    # All markup goes into one flat list and is joined once at the end
+    parts = []
+    esc = _memo_escape()
 
     # header
-    header_cells = []
-    for col_name in df_preview.columns:
-        header_cells.append(f"<th>{html.escape(str(col_name))}</th>")
-    html_rows.append("<tr>" + "".join(header_cells) + "</tr>")
+    parts.append("<tr>")
+    for col_name in columns:
+        parts.extend(("<th>", esc(col_name), "</th>"))
+    parts.append("</tr>")
 
     # data rows
-    for r_idx in range(len(df_preview)):
-        row_series = df_preview.iloc[r_idx]
-        cells_html = []
-        for c_idx in range(len(df_preview.columns)):
-            val = row_series.iloc[c_idx] if hasattr(row_series, "iloc") else row_series[c_idx]
-            text = "" if pd.isna(val) else str(val)
-            style = ""
-            if (r_idx, c_idx) in green_df_coords:
-                style = "background:#C6EFCE;"
-            elif (r_idx, c_idx) in red_df_coords:
-                style = "background:#FFC7CE;"
-            cells_html.append(f"<td style='{style}'>{html.escape(text)}</td>")
-        html_rows.append("<tr>" + "".join(cells_html) + "</tr>")
-
-    return css + "<table class='excel-preview'>" + "".join(html_rows) + "</table>"
+    for r_idx, row_values in enumerate(data_rows):
+        parts.append("<tr>")
+        grc = green_by_row.get(r_idx)
+        rrc = red_by_row.get(r_idx)
+        for c_idx, val in enumerate(row_values):
+            text = "" if val is None else esc(val)
+            if grc and c_idx in grc:
+                td_open = _TD_GREEN_OPEN
+            elif rrc and c_idx in rrc:
+                td_open = _TD_RED_OPEN
+            else:
+                td_open = _TD_OPEN
+            parts.extend((td_open, text, "</td>"))
+        parts.append("</tr>")
+
+    return "".join((css, "<table class='excel-preview'>", *parts, "</table>"))
@@ -1,6 +1,7 @@
 # file_manager.py
 from pathlib import Path
 from collections import defaultdict
+import os
 import re
 import shutil
 from typing import Optional
@@ -16,6 +17,18 @@ OUTPUT_SUFFIXES = [
     "_SigTestTable.xlsx",
 ]
 
+# uploads below this are written from getbuffer() in one go; larger ones are streamed
+_SMALL_UPLOAD_BYTES = 4 * 1024 * 1024
+_COPY_CHUNK_BYTES = 1024 * 1024
+
+# One pass that strips an exact OUTPUT_SUFFIXES ending (case-sensitive) plus any
+# trailing _Green/_highlighted/... chunks before it (case-insensitive). The search
+# takes the leftmost match, i.e. the longest strippable tail.
+_STRIP_RE = re.compile(
+    r'(?i:(?:_(?:Green|highlighted|SigTestTable|cells|SigTestTable_Green))*)'
+    r'(?:' + '|'.join(re.escape(s) for s in OUTPUT_SUFFIXES) + r')?$'
+)
+
 def save_uploaded_file(uploaded_file, target_dir: Path, filename: Optional[str] = None) -> Path:
     """
     Save a Streamlit uploaded file to target_dir.
@@ -46,39 +59,57 @@ def save_uploaded_file(uploaded_file, target_dir: Path, filename: Optional[str]
         # Some objects may not support seek; ignore if so
         pass
 
-    # Try the efficient path first (getbuffer), fallback to read() or copyfileobj
+    # Stream in fixed-size chunks so a large upload is never held in memory a second
+    # time; only small objects that expose getbuffer() are written in one call.
+    # The data goes to a ".part" file that is renamed over out_path once complete, so a
+    # concurrent preview never sees a half-written workbook.
+    size = getattr(uploaded_file, "size", None)
+    tmp_path = out_path.with_name(out_path.name + ".part")
     try:
-        if hasattr(uploaded_file, "getbuffer"):
-            data = uploaded_file.getbuffer()
-            with open(out_path, "wb") as fh:
-                fh.write(data)
-        else:
-            # try read() — many Streamlit UploadedFile objects support this
+        try:
+            with open(tmp_path, "wb") as fh:
+                if hasattr(uploaded_file, "getbuffer") and size is not None and size < _SMALL_UPLOAD_BYTES:
+                    fh.write(uploaded_file.getbuffer())
+                else:
+                    shutil.copyfileobj(uploaded_file, fh, length=_COPY_CHUNK_BYTES)
+        except TypeError:
+            # text-mode stream (read() returns str): encode it
+            try:
+                uploaded_file.seek(0)
+            except Exception:
+                pass
             content = uploaded_file.read()
-            # If read() returns a string accidentally, encode
             if isinstance(content, str):
                 content = content.encode()
-            with open(out_path, "wb") as fh:
+            with open(tmp_path, "wb") as fh:
                 fh.write(content)
-    except Exception:
-        # Last-resort safe copy using file-like streaming
+        os.replace(tmp_path, out_path)
+    except BaseException:
         try:
-            uploaded_file.seek(0)
-        except Exception:
+            tmp_path.unlink()
+        except OSError:
             pass
-        with open(out_path, "wb") as fh:
-            shutil.copyfileobj(uploaded_file, fh)
+        raise
 
     return out_path.resolve()
 
+def scan_output_files(output_dir: Path):
+    """
+    Return os.DirEntry objects for the regular files in output_dir ([] if missing), unsorted.
+    scandir carries the file type with each entry, so no per-file stat is needed to filter;
+    entry.stat() is cached on the entry if a caller wants mtime/size.
+    """
+    try:
+        with os.scandir(output_dir) as it:
+            return [e for e in it if e.is_file()]
+    except FileNotFoundError:
+        return []
+
 def list_output_files(output_dir: Path):
     """
     Return list(Path) of files in output_dir sorted by name.
     """
-    p = Path(output_dir)
-    if not p.exists():
-        return []
-    return sorted([f for f in p.iterdir() if f.is_file()])
+    return sorted((Path(e.path) for e in scan_output_files(Path(output_dir))), key=lambda x: x.name)
 
 def group_outputs_by_table(output_dir: Path):
     """
@@ -86,19 +117,18 @@ def group_outputs_by_table(output_dir: Path):
     E.g. "B1_Stance_Green_highlighted.xlsx" -> "B1_Stance"
     Returns dict: {table_title: [Path, ...], ...}
     """
-    files = list_output_files(Path(output_dir))
+    # group the bare entries; Paths are only built for what ends up in the result
+    groups = group_files_by_table(scan_output_files(Path(output_dir)))
+    return {k: [Path(e.path) for e in v] for k, v in groups.items()}
+
+def group_files_by_table(files):
+    """
+    Same grouping as group_outputs_by_table, for an already-listed iterable of Paths
+    (lets callers that scanned the folder themselves avoid a second directory walk).
+    """
     groups = defaultdict(list)
     for f in files:
-        name = f.name
-        base = name
-        # remove any known suffix exactly
-        for suf in OUTPUT_SUFFIXES:
-            if base.endswith(suf):
-                base = base[: -len(suf)]
-                break
-        # remove repeated trailing suffix chunks like _Green or _highlighted etc
-        base = re.sub(r'(_(Green|highlighted|SigTestTable|cells|SigTestTable_Green))+$', '', base, flags=re.IGNORECASE)
-        base = base.rstrip("_")
+        base = _STRIP_RE.sub('', f.name, count=1).rstrip("_")
         groups[base].append(f)
     for k in groups:
         groups[k] = sorted(groups[k], key=lambda p: p.name)
@@ -6,6 +6,9 @@ import os
 import re
 from pathlib import Path
 
+# papermill progress lines look like "Executing:  42%|..."
+_PM_PROG_RE = re.compile(r"Executing:\s*(\d+)%")
+
 
 def run_with_papermill(nb_path: Path, input_file: Path, output_dir: Path, on_progress=None):
     """
@@ -29,7 +32,10 @@ def run_with_papermill(nb_path: Path, input_file: Path, output_dir: Path, on_pro
             def emit(self, record):
                 try:
                     msg = record.getMessage()
-                    m = re.search(r"Executing:\s*(\d+)%", msg)
+                    # most papermill records are not progress lines; skip the regex for them
+                    if "Executing:" not in msg:
+                        return
+                    m = _PM_PROG_RE.search(msg)
                     if m:
                         pct = int(m.group(1))
                         on_progress(pct / 100.0, msg)